@@ -79,14 +79,18 @@ Examples:
     ...
 """
 import re
-from typing import Dict, Iterable
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from itertools import islice
+from typing import Deque, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 import jc.utils
 from jc.streaming import (
     add_jc_meta, streaming_input_type_check, streaming_line_input_type_check, raise_or_yield
 )
 from jc.jc_types import JSONDictType, StreamingOutputType
 from jc.exceptions import ParseError
-import json
 
 class info():
     """Provides parser metadata (version, author, etc.)"""
@@ -102,6 +106,161 @@ class info():
 __version__ = info.version
 
 
+# Exemple (format par défaut pour les MPMs threadés)
+# ErrorLogFormat "[%{u}t] [%-m:%l] [pid %P:tid %T] %7F: %E: [client\ %a] %M% ,\ referer\ %{Referer}i"
+_MSG_DETAIL_RE = re.compile(
+    r'\[client (\S+)\] (?P<msg_detail>[^\[]*) (?P<fuck>\[\S\S+)'
+)
+
+_HEADER_RE = re.compile(
+    r'^\[(?P<date>(?P<day_of_week>\S\S\S) (?P<month>\S\S\S) (?P<day>\d\d) '
+    r'(?P<hour>\d\d):(?P<minute>\d\d):(?P<second>\d+\.\d+) (?P<year>\d\d\d\d))\] '
+    r'\[(?P<loglevel>\S+)\] '
+    r'\[pid (?P<pid>\d+)\] '
+    r'\[client (?P<client_port>\S+)\] '
+    r'\[client (?P<client>\S+)\] '
+)
+
+# per-request fields (hostname, uri, unique_id) start here and close the line
+_REQUEST_FIELDS = ' [hostname "'
+
+# the matched request content, which differs between hits of the same rule
+_DATA_FIELD = '[data "'
+
+_FIELD_KEYS = frozenset((
+    'file', 'line', 'id', 'msg', 'data', 'severity', 'ver', 'hostname', 'uri',
+    'unique_id'
+))
+
+_INT_KEYS = frozenset((
+    'day', 'year', 'hour', 'minute', 'second', 'status', 'bytes', 'pid', 'line'
+))
+
+# lines handed to a worker process at a time when parsing with `workers`
+_CHUNK_SIZE = 4096
+
+_MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+_TAGS_RE = re.compile(r'(?P<tags>(?:\[tag [^\[]*)+)')
+
+
+def _closing_quote(line: str, value_start: int) -> int:
+    """
+    Index of the first `"` at or after `value_start` that is not escaped by
+    an odd number of backslashes, or -1 if there is none.
+    """
+    quote = line.find('"', value_start)
+
+    while quote != -1:
+        backslash = quote
+        while backslash > value_start and line[backslash - 1] == '\\':
+            backslash -= 1
+
+        if (quote - backslash) % 2 == 0:
+            break
+
+        quote = line.find('"', quote + 1)
+
+    return quote
+
+
+def _scan_fields(line: str) -> Dict[str, str]:
+    """
+    Collect the `[key "value"]` fields of a ModSecurity message with plain
+    string scanning. Only keys in `_FIELD_KEYS` are kept; a `\\"` inside a
+    value does not end it. When a key repeats, the last value wins.
+
+    Parameters:
+
+        line:        (string) log line to scan
+
+    Returns:
+
+        Dictionary of field names to raw string values.
+    """
+    fields: Dict[str, str] = {}
+    find = line.find
+    pos = find('[')
+
+    while pos != -1:
+        key_end = find(' ', pos + 1)
+        if key_end == -1:
+            break
+
+        key = line[pos + 1:key_end]
+        if key in _FIELD_KEYS and line.startswith('"', key_end + 1):
+            value_start = key_end + 2
+            quote = _closing_quote(line, value_start)
+
+            if quote != -1 and line.startswith(']', quote + 1):
+                fields[key] = line[value_start:quote]
+                pos = find('[', quote + 2)
+                continue
+
+        pos = find('[', pos + 1)
+
+    return fields
+
+
+@lru_cache(maxsize=8192)
+def _extract_rule(rule: str) -> Dict[str, str]:
+    """
+    Cached field and tag extraction for the rule part of a message: the
+    fields from the first `[` after the message text up to `[hostname ...]`,
+    with the `[data ...]` field cut out. The message text and `data` quote
+    the request, so they are parsed per line; what is left (file, line, id,
+    msg, severity, ver, tags) repeats each time the same rule fires. The
+    returned dictionary is shared between calls and must not be modified.
+    """
+    fields = _scan_fields(rule)
+
+    tags_match = _TAGS_RE.search(rule)
+    if tags_match:
+        fields['tags'] = tags_match.group('tags')
+
+    return fields
+
+
+@lru_cache(maxsize=4096)
+def _ts(date_str: str) -> Optional[int]:
+    """
+    Naive epoch timestamp for a fixed-layout ModSecurity date such as
+    `Mon Jan 08 15:39:56.735479 2024`. Fields are read by position and the
+    month through `_MONTHS` instead of going through strptime. Returns None
+    if the date cannot be converted.
+    """
+    try:
+        dt = datetime(
+            int(date_str[-4:]),
+            _MONTHS[date_str[4:7]],
+            int(date_str[8:10]),
+            int(date_str[11:13]),
+            int(date_str[14:16]),
+            int(date_str[17:date_str.index('.', 17)])
+        )
+    except (KeyError, ValueError):
+        return None
+
+    return int(dt.timestamp())
+
+
+def invalidate_cache() -> None:
+    """
+    Clear the rule-field and timestamp caches. Patterns are compiled once at
+    import and are not affected. Long-running library users can call this
+    between unrelated log sources to release the cached entries.
+
+    Returns:
+
+        None
+    """
+    _extract_rule.cache_clear()
+    _ts.cache_clear()
+
+
 def _process(proc_data: JSONDictType) -> JSONDictType:
     """
     Final processing to conform to the schema.
@@ -114,33 +273,129 @@ def _process(proc_data: JSONDictType) -> JSONDictType:
 
         Dictionary. Structured data to conform to the schema.
     """
-    int_list = {'day', 'year', 'hour', 'minute', 'second', 'status', 'bytes', 'pid','line'}
-
-    for key, val in proc_data.items():
+    to_int = jc.utils.convert_to_int
 
-        # integer conversions
-        if key in int_list:
-            proc_data[key] = jc.utils.convert_to_int(val)
+    # integer conversions
+    for key, val in list(proc_data.items()):
+        if key in _INT_KEYS:
+            proc_data[key] = to_int(val)
 
-        # convert `-` and blank values to None
-        if val == '-' or val == '':
-            proc_data[key] = None
+    # convert `-` and blank values to None
+    proc_data = {
+        key: None if val in ('-', '') else val
+        for key, val in proc_data.items()
+    }
 
     # add unix timestamps
     if 'date' in proc_data:
-        ts = jc.utils.timestamp(proc_data['date'], format_hint=(1800,))
-        proc_data['epoch'] = ts.naive
-        proc_data['epoch_utc'] = ts.utc
+        proc_data['epoch'] = _ts(proc_data['date'])
+        # the ModSecurity date carries no timezone
+        proc_data['epoch_utc'] = None
 
     return proc_data
 
 
+_ParseResult = Union[JSONDictType, Tuple[BaseException, str]]
+
+
+def _parse_lines(data: Iterable[str], raw: bool) -> Iterator[_ParseResult]:
+    """
+    Parse lines one by one. Successfully parsed lines are yielded as
+    dictionaries; failures are yielded as `(exception, line)` tuples so the
+    caller decides whether to raise them (see `raise_or_yield`).
+    """
+    for line in data:
+        try:
+            streaming_line_input_type_check(line)
+            output_line: Dict = {}
+            if not line.strip():
+                continue
+            # TEST_DATA="""[Mon Jan 08 15:39:55.735479 2024] [:error] [pid 3426173] [client 90.65.66.20:56764] [client 90.65.66.20] ModSecurity: Warning. Invalid URL Encoding: Non-hexadecimal digits used at REQUEST_BODY. [file "/usr/share/modsecurity-crs/rules/REQUEST-920-PROTOCOL-ENFORCEMENT.conf"] [line "364"] [id "920240"] [msg "URL Encoding Abuse Attack Attempt"] [data "\\x00\\x00\\x00\\x18ftypmp42\\x00\\x00\\x00\\x00mp42mp41\\x00\\x00\\xf3\\xd7moov\\x00\\x00\\x00lmvhd\\x00\\x00\\x00\\x00\\xe1\\xc1\\xb4\\xd1\\xe1\\xc1\\xb4\\xe9\\x00\\x01_\\x90\\x00\\x9a\\x03\\x80\\x00\\x01\\x00\\x00\\x01\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x01\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x01\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00@\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x03\\x00\\x00\\x93\\xf3trak\\x00\\x00\\x..."] [severity "WARNING"] [ver "OWASP_CRS/3.2.0"] [tag "application-multi"] [tag "language-multi"] [tag "platform-multi"] [tag "attack-protocol"] [tag "paranoia-level/1"] [tag "OWASP_CRS"] [tag "OWASP_CRS/PROTOCOL_VIOLATION/EVASION"] [hostname "nextcloud.msh-lse.fr"] [uri "/remote.php/dav/uploads/christian.dury@cnrs.fr/web-file-upload-c966aa5744d68523/1"] [unique_id "ZZwJNqT4GaedrCMW56VQ3QAAAB0"]"""
+            msg_detail_match = _MSG_DETAIL_RE.search(line)
+            if msg_detail_match:
+                output_line['msg_detail'] = msg_detail_match.group('msg_detail')
+                output_line['fuck'] = msg_detail_match.group('fuck')
+
+            rule_start = 0
+            header_match = _HEADER_RE.match(line)
+            if header_match:
+                output_line.update(header_match.groupdict())
+                rule_start = header_match.end()
+
+            # keep the trailing space so the last tag matches as before
+            rule_end = line.rfind(_REQUEST_FIELDS, rule_start) + 1
+            if not rule_end:
+                rule_end = len(line)
+
+            # skip the free-text message before the first field
+            rule_start = line.find('[', rule_start, rule_end)
+            if rule_start == -1:
+                rule_start = rule_end
+
+            rule = line[rule_start:rule_end]
+            data_value = None
+            data_start = rule.rfind(_DATA_FIELD)
+            if data_start != -1:
+                value_start = data_start + len(_DATA_FIELD)
+                quote = _closing_quote(rule, value_start)
+                if quote != -1 and rule.startswith(']', quote + 1):
+                    data_value = rule[value_start:quote]
+                    rule = rule[:data_start] + rule[quote + 2:]
+
+            output_line.update(_extract_rule(rule))
+            if data_value is not None:
+                output_line['data'] = data_value
+            output_line.update(_scan_fields(line[rule_end:]))
+
+            yield output_line if raw else _process(output_line)
+
+        except Exception as e:
+            yield e, line
+
+
+def _parse_chunk(chunk: List[str], raw: bool) -> List[_ParseResult]:
+    """Worker process entry point: parse a chunk of lines."""
+    return list(_parse_lines(chunk, raw))
+
+
+def _chunks(data: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Split the input into lists of at most `size` lines."""
+    iterator = iter(data)
+    chunk = list(islice(iterator, size))
+    while chunk:
+        yield chunk
+        chunk = list(islice(iterator, size))
+
+
+def _parse_parallel(
+    data: Iterable[str],
+    raw: bool,
+    workers: int
+) -> Iterator[_ParseResult]:
+    """
+    Parse `_CHUNK_SIZE`-line chunks in a pool of `workers` processes and
+    yield the results in input order. Only `2 * workers` chunks are in
+    flight at a time so the input is still consumed as a stream.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending: Deque[Future] = deque()
+
+        for chunk in _chunks(data, _CHUNK_SIZE):
+            pending.append(executor.submit(_parse_chunk, chunk, raw))
+            if len(pending) >= 2 * workers:
+                yield from pending.popleft().result()
+
+        while pending:
+            yield from pending.popleft().result()
+
+
 @add_jc_meta
 def parse(
     data: Iterable[str],
     raw: bool = False,
     quiet: bool = False,
-    ignore_exceptions: bool = False
+    ignore_exceptions: bool = False,
+    workers: int = 0
 ) -> StreamingOutputType:
     """
     Main text parsing generator function. Returns an iterable object.
@@ -153,7 +408,9 @@ def parse(
         raw:               (boolean)   unprocessed output if True
         quiet:             (boolean)   suppress warning messages if True
         ignore_exceptions: (boolean)   ignore parsing exceptions if True
-
+        workers:           (integer)   parse in this many worker processes,
+                                       in chunks of lines (module only).
+                                       0 parses in the current process
 
     Returns:
 
@@ -196,102 +453,13 @@ def parse(
     #         (?P<day>\d+)/
     
 
-    # Exemple (format par défaut pour les MPMs threadés)
-    # ErrorLogFormat "[%{u}t] [%-m:%l] [pid %P:tid %T] %7F: %E: [client\ %a] %M% ,\ referer\ %{Referer}i"
-    patterns = [
-            r'''
-^.*\[client[ ](\S+)\][ ](?P<msg_detail>[^\[]*)[ ](?P<fuck>\[\S\S+)
-            ''',
-            r'''
-^\[(?P<date>
-(?P<day_of_week>\S\S\S)[ ]
-(?P<month>\S\S\S)[ ]
-(?P<day>\d\d)[ ]
-(?P<hour>\d\d)[:]
-(?P<minute>\d\d)[:]
-(?P<second>\d+\.\d+)[ ]
-(?P<year>\d\d\d\d)
-)
-\][ ]
-\[(?P<loglevel>\S+)\][ ]
-\[pid[ ](?P<pid>\d+)\][ ]
-\[client[ ](?P<client_port>\S+)\][ ]
-\[client[ ](?P<client>\S+)\][ ]
-            ''',
-r'''
-^.*(\[file[ ]"(?P<file>[@A-Za-z0-9_\./\\-]*)"\][ ])
-''',
-r'''
-^.*(\[line[ ]"(?P<line>[@A-Za-z0-9_\./\\-]*)"\][ ])
-''',
-r'''
-^.*(\[id[ ]"(?P<id>\d+)"\][ ])
-''',
-r'''
-^.*(\[msg[ ]"(?P<msg>[^\[]*)"\][ ])
-''',
-r'''
-^.*(\[data[ ]"(?P<data>[^\[]*)[ ])
-''',
-r'''
-^.*(\[severity[ ]"(?P<severity>[^\[]*)"\][ ])
-''',
-r'''
-^.*(\[ver[ ]"(?P<ver>[^\[]*)"\][ ])
-''',
-r'''
-^.*(\[hostname[ ]"(?P<hostname>[^\[]*)"\][ ])
-''',
-r'''
-^.*(\[uri[ ]"(?P<uri>[^\[]*)"\][ ])
-''',
-r'''
-^.*(\[unique_id[ ]"(?P<unique_id>[^\[]*)"\])
-''',
-r'''
-^.*(?P<tags>(\[tag[ ]([^\[]*))+)
-'''
-            ]
-
+    if workers:
+        results = _parse_parallel(data, raw, workers)
+    else:
+        results = _parse_lines(data, raw)
 
-    for line in data:
-        try:
-            streaming_line_input_type_check(line)
-            output_line: Dict = {}
-            if not line.strip():
-                continue
-            # TEST_DATA="""[Mon Jan 08 15:39:55.735479 2024] [:error] [pid 3426173] [client 90.65.66.20:56764] [client 90.65.66.20] ModSecurity: Warning. Invalid URL Encoding: Non-hexadecimal digits used at REQUEST_BODY. [file "/usr/share/modsecurity-crs/rules/REQUEST-920-PROTOCOL-ENFORCEMENT.conf"] [line "364"] [id "920240"] [msg "URL Encoding Abuse Attack Attempt"] [data "\\x00\\x00\\x00\\x18ftypmp42\\x00\\x00\\x00\\x00mp42mp41\\x00\\x00\\xf3\\xd7moov\\x00\\x00\\x00lmvhd\\x00\\x00\\x00\\x00\\xe1\\xc1\\xb4\\xd1\\xe1\\xc1\\xb4\\xe9\\x00\\x01_\\x90\\x00\\x9a\\x03\\x80\\x00\\x01\\x00\\x00\\x01\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x01\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x01\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00@\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x00\\x03\\x00\\x00\\x93\\xf3trak\\x00\\x00\\x..."] [severity "WARNING"] [ver "OWASP_CRS/3.2.0"] [tag "application-multi"] [tag "language-multi"] [tag "platform-multi"] [tag "attack-protocol"] [tag "paranoia-level/1"] [tag "OWASP_CRS"] [tag "OWASP_CRS/PROTOCOL_VIOLATION/EVASION"] [hostname "nextcloud.msh-lse.fr"] [uri "/remote.php/dav/uploads/christian.dury@cnrs.fr/web-file-upload-c966aa5744d68523/1"] [unique_id "ZZwJNqT4GaedrCMW56VQ3QAAAB0"]"""
-            apache_dict = { 'raw': line.strip()}
-            for pattern in patterns:
-                clf_pattern = re.compile(pattern, re.VERBOSE)
-                clf_match = re.match(clf_pattern, line)
-                # print(line.strip())
-                # print('fuck')
-                # print(TEST_DATA)
-                # print('fuck')
-                # output_line = clf_match.groupdict()
-                # print(line)
-                # print(clf_match.groupdict())
-                if clf_match:
-                    # output_line = output_line | clf_match.groupdict()
-                    output_line = { **output_line , ** clf_match.groupdict()}
-                # print(json.dumps(output_line,indent=4))
-                # print(pattern)
-                # print(line)
-                #     if output_line.get('request', None):
-                #         request_string = output_line['request']
-                #         request_match = re.match(request_pattern, request_string)
-                #         if request_match:
-                #              output_line.update(request_match.groupdict())
-
-                # else:
-                #     output_line = {"unparsable": line.strip()}
-            # _process(apache_dict)
-            # if output_line:
-            yield output_line if raw else _process(output_line)
-            # else:
-                # raise ParseError('Not Common Log Format data')
-
-        except Exception as e:
-            print(e)
-            yield raise_or_yield(ignore_exceptions, e, line)
+    for result in results:
+        if isinstance(result, dict):
+            yield result
+        else:
+            yield raise_or_yield(ignore_exceptions, *result)
@@ -76,23 +76,21 @@ def _process(proc_data: List[JSONDictType]) -> List[JSONDictType]:
     # conversions and timestamps
 
     return proc_data
-def Convert(lst):
-    try:
-        res_dct = { "type": "" }
-        for field in lst:
-            split_field = field.split("=")
-            if len(split_field) != 2:
-                if(field.startswith("[") or field.endswith("]")):
-                    res_dct["type"] = (res_dct["type"] + " " + field.replace('[', '').replace(']', '')).lstrip()
-                else:
-                    res_dct[field] = ""
-                continue
-            label = split_field[0]
-            value = split_field[1]
+def Convert(line):
+    res_dct = { "type": "" }
+    types = []
+    for field in line.split():
+        label, eq, value = field.partition("=")
+        if eq:
             res_dct[label] = value
-        return res_dct
-    except Exception as e:
-        print(e)
+        elif field[0] == "[" or field[-1] == "]":
+            types.append(field.strip("[]"))
+        else:
+            res_dct[field] = ""
+    # join the [bracketed] fragments once instead of concatenating per token
+    if types:
+        res_dct["type"] = " ".join(types).lstrip()
+    return res_dct
 def parse(
     data: str,
     raw: bool = False,
@@ -115,6 +113,8 @@ def parse(
     jc.utils.input_type_check(data)
 
     raw_output: List[Dict] = []
+    append = raw_output.append
+    skipped = 0
 
     if jc.utils.has_data(data):
 
@@ -124,17 +124,19 @@ def parse(
             # check out helper functions in jc.utils
             # and jc.parsers.universal
             try:
-                # print(line.split(" "))
-                if(not is_json(line)):
-                    raw_output.append(Convert(line.split(" ")))
-                else:
+                try:
                     json_output = json.loads(line)
-                    # print(line)
-                    json_output['MESSAGE'] = Convert(json_output['MESSAGE'].split(" "))
+                except ValueError:
+                    append(Convert(line))
+                else:
+                    json_output['MESSAGE'] = Convert(json_output['MESSAGE'])
                     json_output['MESSAGE']['time'] = convert_time(json_output['__REALTIME_TIMESTAMP'])
-                    raw_output.append(json_output)
-            except Exception as e: print(e)
-            pass
+                    append(json_output)
+            except Exception:
+                skipped += 1
+
+    if skipped and not quiet:
+        jc.utils.warning_message([f'{skipped} line(s) could not be parsed and were skipped.'])
 
     return raw_output if raw else _process(raw_output)
 
@@ -143,11 +145,3 @@ def convert_time(time):
     # print(time)
     import datetime
     return datetime.datetime.fromtimestamp(int(time) / 1e6).astimezone().isoformat()
-
-# create a function to test if string is a valid json  
-def is_json(myjson):  
-    try:  
-        json_object = json.loads(myjson)  
-    except ValueError as e:  
-        return False  
-    return True
\ No newline at end of file